@@ -1,54 +1,75 @@
 #!/usr/bin/env python3
 """
-vconfig.py — a vconfig-like wrapper implemented with ip(8).
+vconfig.py — a vconfig-like tool implemented over rtnetlink (no ip(8) exec).
 Liam Romanis
 https://github.com/liamromanis101/vconfig
 
 Usage:
 
   add [interface-name] [vlan_id] [-name IFNAME]
+  add_range [interface-name] [first_vid] [last_vid]
   rem [vlan-name]
+  rem_range [interface-name] [first_vid] [last_vid]
   set_flag [vlan-name] [flag-num] [0|1]
   set_flag [vlan-name] [0|1]
   set_egress_map [vlan-name] [skb_priority] [vlan_qos]
   set_ingress_map [vlan-name] [skb_priority] [vlan_qos]
+  batch [file|-]
 
 Notes:
 - Only creates/deletes VLAN links; it does not bring links up.
 - set_flag supports: 1=reorder_hdr, 2=gvrp, 3=mvrp, 4=loose_binding.
 - VLAN IDs are decimal (1..4094).
-- On too-long/invalid interface names, the tool will prompt you for a shorter one.
+- On too-long/invalid interface names, the tool will prompt you for a shorter one
+  (or use vlan<VID> when stdin is not a terminal).
+- add_range creates <interface>.<VID> for every VID in the range (vlan<VID> if
+  that name is too long), sending the requests to the kernel in batches;
+  rem_range deletes the same set of names the same way.
+- batch runs one command per line (from a file, or stdin with '-') in a single
+  process over one rtnetlink socket; '#' starts a comment. It stops at the
+  first failing command, like 'ip -batch'.
 """
 
 import os
 import sys
+import ctypes
+import errno
+import itertools
+import select
+import socket
+import struct
 import subprocess
 import shlex
-import re
 
-# ---- ifname / retry helpers -------------------------------------------------
+# ---- ifname helpers ---------------------------------------------------------
 
 # Kernel IFNAMSIZ is 16 (including trailing NUL) → 15 visible chars
 IFNAMSIZ = 16
 MAX_IFNAME_LEN = IFNAMSIZ - 1
 
-# iproute2 error text when the provided name is too long/invalid
-_INVALID_IFNAME_RE = re.compile(r"(invalid ifname|not a valid ifname)", re.IGNORECASE)
+
+# Bytes the kernel's isspace() accepts (its ctype table includes 0xA0)
+_IFNAME_SPACE = b" \t\n\v\f\r\xa0"
 
 
 def _valid_ifname(name):
-    if not name or len(name) > MAX_IFNAME_LEN:
+    # Same rules as the kernel's dev_valid_name(), applied to the bytes that
+    # are sent, so a name that passes here is not rejected for its spelling.
+    raw = os.fsencode(name)
+    if not raw or len(raw) > MAX_IFNAME_LEN:
+        return False
+    if raw in (b".", b".."):
         return False
-    if any(ch.isspace() for ch in name):
+    if any(b in _IFNAME_SPACE for b in raw):
         return False
-    if "/" in name:
+    if b"/" in raw or b":" in raw or b"\0" in raw:
         return False
     return True
 
 
 def _prompt_for_ifname(suggest=None):
     """
-    Ask the user for a valid interface name (≤15 chars, no whitespace or '/').
+    Ask the user for a valid interface name (≤15 chars, no whitespace, '/' or ':').
     Keeps prompting until a valid-looking name is entered.
     """
     while True:
@@ -63,90 +84,308 @@ def _prompt_for_ifname(suggest=None):
         name = entered or (suggest or "")
         if _valid_ifname(name):
             return name
-        print(f"'{name}' is not a valid ifname. It must be ≤{MAX_IFNAME_LEN} chars, with no whitespace or '/'. Try again.")
+        print(f"'{name}' is not a valid ifname. It must be ≤{MAX_IFNAME_LEN} chars, with no whitespace, '/' or ':'. Try again.")
 
 
-def _replace_or_inject_name(cmd, new_name):
+def _fallback_ifname(vid):
     """
-    Replace token after 'name' if present; otherwise inject 'name <new_name>'
-    before 'type vlan' if found, else append at end.
+    Replacement for a default name that is too long/invalid: prompt on a
+    terminal, otherwise use vlan<VID> without asking.
+    """
+    if not sys.stdin.isatty():
+        return f"vlan{vid}"
+    return _prompt_for_ifname(f"vlan{vid}")
+
+
+# ---- rtnetlink --------------------------------------------------------------
+
+# <linux/netlink.h>
+NLMSG_ERROR = 2
+NLM_F_REQUEST = 0x001
+NLM_F_ACK = 0x004
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+
+# <linux/rtnetlink.h>, <linux/if_link.h>
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+IFLA_IFNAME = 3
+IFLA_LINK = 5
+IFLA_LINKINFO = 18
+IFLA_INFO_KIND = 1
+IFLA_INFO_DATA = 2
+IFLA_VLAN_ID = 1
+IFLA_VLAN_FLAGS = 2
+IFLA_VLAN_EGRESS_QOS = 3
+IFLA_VLAN_INGRESS_QOS = 4
+IFLA_VLAN_QOS_MAPPING = 1
+
+# <linux/if_vlan.h>
+VLAN_FLAG_REORDER_HDR = 0x1
+VLAN_FLAG_GVRP = 0x2
+VLAN_FLAG_LOOSE_BINDING = 0x4
+VLAN_FLAG_MVRP = 0x8
+
+SOL_NETLINK = 270
+NETLINK_CAP_ACK = 10
+SO_RCVBUFFORCE = 33
+
+# Bytes of requests per NlBatch flush; matches the kernel's NLMSG_GOODSIZE
+# (and FRR zebra's dataplane batch size)
+NL_BATCH_SIZE = 16384
+
+# Seconds NlBatch waits on epoll for the socket before giving up
+NL_ACK_TIMEOUT = 5.0
+
+# Wire layouts, compiled once at import
+_NLMSGHDR = struct.Struct("=IHHII")    # len, type, flags, seq, pid
+_IFINFOMSG = struct.Struct("=BxHiII")  # family, type, index, flags, change
+_NLATTR = struct.Struct("=HH")         # len, type
+_S32 = struct.Struct("=i")
+_U16 = struct.Struct("=H")
+_U32 = struct.Struct("=I")
+_U32_PAIR = struct.Struct("=II")
+
+# One NETLINK_ROUTE socket for the whole process, opened on first use
+_NL_SOCK = None
+_NL_SEQ = itertools.count(1)
+
+# Every reply is read into this one buffer instead of a fresh bytes object
+# per recv. An ACK is at most one request frame plus headers, and no frame
+# we send comes near NL_BATCH_SIZE (NLMSG_GOODSIZE).
+_NL_RXBUF = bytearray(NL_BATCH_SIZE)
+_NL_RXVIEW = memoryview(_NL_RXBUF)
+
+
+def _nl_sock():
+    global _NL_SOCK
+    if _NL_SOCK is None:
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, 0))
+        except OSError as e:
+            die(f"cannot open rtnetlink socket: {e.strerror}")
+        # Best effort: ACK errors with just the header (not the whole request)
+        # and room to queue a full batch of ACKs without ENOBUFS.
+        for level, opt, val in ((SOL_NETLINK, NETLINK_CAP_ACK, 1),
+                                (socket.SOL_SOCKET, SO_RCVBUFFORCE, 1 << 20)):
+            try:
+                sock.setsockopt(level, opt, val)
+            except OSError:
+                pass
+        _NL_SOCK = sock
+    return _NL_SOCK
+
+
+def _nla(kind, payload):
+    """Pack one netlink attribute (struct nlattr + payload, 4-byte aligned)."""
+    size = 4 + len(payload)
+    return _NLATTR.pack(size, kind) + payload + b"\0" * (-size & 3)
+
+
+def _nla_ifname(name):
+    return _nla(IFLA_IFNAME, os.fsencode(name) + b"\0")
+
+
+_KIND_VLAN = _nla(IFLA_INFO_KIND, b"vlan\0")
+
+
+def _vlan_linkinfo(*data):
+    """IFLA_LINKINFO { IFLA_INFO_KIND "vlan", IFLA_INFO_DATA { *data } }"""
+    return _nla(IFLA_LINKINFO, _KIND_VLAN + _nla(IFLA_INFO_DATA, b"".join(data)))
+
+
+def _nl_msg(msg_type, flags, ifindex, attrs):
+    """
+    Build one nlmsghdr + ifinfomsg request frame.
+    Returns (seq, frame).
+    """
+    seq = next(_NL_SEQ)
+    body = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, ifindex, 0, 0) + attrs
+    hdr = _NLMSGHDR.pack(_NLMSGHDR.size + len(body), msg_type, flags | NLM_F_REQUEST | NLM_F_ACK, seq, 0)
+    return seq, hdr + body
+
+
+def _nl_acks(data):
+    """Yield (seq, errno) for every NLMSG_ERROR/ACK message in one datagram."""
+    off = 0
+    while off + 16 <= len(data):
+        length, kind, _, seq, _ = _NLMSGHDR.unpack_from(data, off)
+        if kind == NLMSG_ERROR:
+            yield seq, -_S32.unpack_from(data, off + 16)[0]
+        if length < 16:
+            break
+        off += (length + 3) & ~3
+
+
+def _nl_recv(sock, flags=0):
+    """
+    Receive one datagram into the shared _NL_RXBUF and return a view of it.
+    The view is only valid until the next call.
     """
-    cmd2 = list(cmd)
     try:
-        i = cmd2.index("name")
-        if i + 1 < len(cmd2):
-            cmd2[i + 1] = new_name
-        else:
-            cmd2.append(new_name)
-        return cmd2
-    except ValueError:
-        pass
+        n = sock.recv_into(_NL_RXBUF, 0, flags)
+    except BlockingIOError:
+        raise
+    except OSError as e:
+        die(f"rtnetlink receive failed: {e.strerror}")
+    return _NL_RXVIEW[:n]
 
+
+def nl_request(msg_type, flags=0, ifindex=0, attrs=b""):
+    """
+    Send one rtnetlink request and wait for its ACK.
+    Returns 0 on success, else the (positive) errno reported by the kernel.
+    """
+    sock = _nl_sock()
+    seq, frame = _nl_msg(msg_type, flags, ifindex, attrs)
     try:
-        j = cmd2.index("type")
-        return cmd2[:j] + ["name", new_name] + cmd2[j:]
-    except ValueError:
-        return cmd2 + ["name", new_name]
+        sock.send(frame)
+    except OSError as e:
+        die(f"rtnetlink send failed: {e.strerror}")
+    while True:
+        for rseq, err in _nl_acks(_nl_recv(sock)):
+            if rseq == seq:
+                return err
+
+
+# ---- sendmmsg(2) via libc (the stdlib has no wrapper) ------------------------
+
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
 
 
-def _extract_name_from_cmd(cmd):
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_sendmmsg():
     try:
-        i = cmd.index("name")
-        if i + 1 < len(cmd):
-            return cmd[i + 1]
-    except ValueError:
-        pass
-    return None
+        fn = ctypes.CDLL(None, use_errno=True).sendmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    fn.restype = ctypes.c_int
+    return fn
 
 
-def run_ip_with_ifname_retry(cmd, vid=None):
-    """
-    Run ip(8) with recovery for 'invalid ifname' errors:
-    - If ip returns an invalid/too-long ifname error, prompt the user
-      for a shorter name (default suggestion: vlan<VID>) and retry.
-    - If ip rejects the new name the same way, re-prompt.
-    - For any other failure, abort with the real error (like run()).
+_SENDMMSG = _load_sendmmsg()
 
-    Returns: (CompletedProcess, final_interface_name)
+
+def _sendmmsg(sock, buf, frames, flags=0):
     """
-    current_cmd = list(cmd)
+    Send each (offset, length) frame of buf as its own datagram with one
+    sendmmsg(2) call. Without libc sendmmsg, fall back to one send() of the
+    frames' bytes — the kernel walks every nlmsghdr in it.
 
+    Returns how many frames were sent; 0 if a non-blocking send would block.
+    """
+    n = len(frames)
+    if _SENDMMSG is None:
+        start = frames[0][0]
+        end = frames[-1][0] + frames[-1][1]
+        try:
+            sock.send(memoryview(buf)[start:end], flags)
+        except BlockingIOError:
+            return 0
+        return n
+    base = ctypes.addressof((ctypes.c_char * len(buf)).from_buffer(buf))
+    iov = (_iovec * n)(*(_iovec(base + off, length) for off, length in frames))
+    msgs = (_mmsghdr * n)()
+    for i in range(n):
+        msgs[i].msg_hdr.msg_iov = ctypes.pointer(iov[i])
+        msgs[i].msg_hdr.msg_iovlen = 1
     while True:
-        proc = subprocess.run(current_cmd, capture_output=True, text=True)
-        if proc.returncode == 0:
-            final_name = _extract_name_from_cmd(current_cmd) or ""
-            return proc, final_name
-
-        combined = (proc.stderr or "") + (proc.stdout or "")
-        if _INVALID_IFNAME_RE.search(combined):
-            suggested = f"vlan{vid}" if vid is not None else None
-
-            # Non-interactive: try one automatic fallback then bail
-            if not sys.stdin.isatty():
-                auto = suggested or "vlan0"
-                if not _valid_ifname(auto):
-                    auto = "vlan0"
-                current_cmd = _replace_or_inject_name(current_cmd, auto)
-                proc2 = subprocess.run(current_cmd, capture_output=True, text=True)
-                if proc2.returncode == 0:
-                    return proc2, auto
-                die(proc.stderr.strip() or f"command failed: {' '.join(map(shlex.quote, current_cmd))}")
-
-            # Interactive: keep prompting until accepted by ip(8)
-            while True:
-                new_name = _prompt_for_ifname(suggested)
-                current_cmd = _replace_or_inject_name(current_cmd, new_name)
-                proc2 = subprocess.run(current_cmd, capture_output=True, text=True)
-                if proc2.returncode == 0:
-                    return proc2, new_name
-                combined2 = (proc2.stderr or "") + (proc2.stdout or "")
-                if _INVALID_IFNAME_RE.search(combined2):
-                    print(f"'{new_name}' was rejected by ip(8). Let's try another.")
-                    continue
-                die(proc2.stderr.strip() or f"command failed: {' '.join(map(shlex.quote, current_cmd))}")
+        r = _SENDMMSG(sock.fileno(), ctypes.addressof(msgs), n, flags)
+        if r >= 0:
+            return r
+        e = ctypes.get_errno()
+        if e == errno.EINTR:
+            continue
+        if e in (errno.EAGAIN, errno.EWOULDBLOCK):
+            return 0
+        raise OSError(e, os.strerror(e))
+
+
+class NlBatch:
+    """
+    Accumulate rtnetlink requests and send them in pipelined bursts.
+
+    Frames are queued until the next one would overflow NL_BATCH_SIZE;
+    flush() then submits all of them back-to-back (sendmmsg(2), MSG_DONTWAIT)
+    and only afterwards drains the ACKs via epoll, matching them to requests
+    by nlmsg_seq — one wait per burst rather than one round-trip per request.
+    Failures are kept in .errors as (tag, errno).
+    """
 
-        # Not an ifname error — behave like run()
-        die(proc.stderr.strip() or f"command failed: {' '.join(map(shlex.quote, current_cmd))}")
+    def __init__(self, limit=NL_BATCH_SIZE):
+        self.sock = _nl_sock()
+        self.limit = limit
+        self.buf = bytearray()
+        self.frames = []
+        self.pending = {}
+        self.errors = []
+
+    def add(self, msg_type, flags=0, ifindex=0, attrs=b"", tag=None):
+        seq, frame = _nl_msg(msg_type, flags, ifindex, attrs)
+        if self.frames and len(self.buf) + len(frame) > self.limit:
+            self.flush()
+        # Frames are whole multiples of 4 bytes, so they stay NLMSG-aligned
+        self.frames.append((len(self.buf), len(frame)))
+        self.buf += frame
+        self.pending[seq] = tag
+
+    def flush(self):
+        if not self.frames:
+            return
+        buf, self.buf = self.buf, bytearray()
+        frames, self.frames = self.frames, []
+        fd = self.sock.fileno()
+        with select.epoll() as ep:
+            ep.register(fd, select.EPOLLOUT)
+            sent = 0
+            while sent < len(frames):
+                try:
+                    n = _sendmmsg(self.sock, buf, frames[sent:], socket.MSG_DONTWAIT)
+                except OSError as e:
+                    die(f"rtnetlink send failed: {e.strerror}")
+                if n == 0:
+                    self._wait(ep, f"timed out sending to rtnetlink ({len(frames) - sent} requests unsent)")
+                sent += n
+            ep.modify(fd, select.EPOLLIN)
+            while self.pending:
+                self._wait(ep, f"timed out waiting for rtnetlink ({len(self.pending)} requests unanswered)")
+                self._drain()
+
+    def _wait(self, ep, timeout_msg):
+        if not ep.poll(NL_ACK_TIMEOUT):
+            die(timeout_msg)
+
+    def _drain(self):
+        # Read every ACK already queued on the socket without blocking
+        while self.pending:
+            try:
+                data = _nl_recv(self.sock, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return
+            for seq, err in _nl_acks(data):
+                if seq not in self.pending:
+                    continue
+                tag = self.pending.pop(seq)
+                if err:
+                    self.errors.append((tag, err))
 
 
 # ---- stock helpers ----------------------------------------------------------
@@ -158,26 +397,49 @@ def die(msg, code=1):
 
 def run(cmd):
     try:
-        subprocess.run(cmd, check=True, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # Only stderr is ever read (for the error message); don't pipe the rest
+        subprocess.run(cmd, check=True, text=True,
+                       stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
     except subprocess.CalledProcessError as e:
         die(e.stderr.strip() or f"command failed: {' '.join(map(shlex.quote, cmd))}")
 
 
+def nl_check(err):
+    if err:
+        die(f"RTNETLINK answers: {os.strerror(err)}")
+
+
+def _ifindex(dev):
+    try:
+        return socket.if_nametoindex(dev)
+    except (OSError, ValueError):
+        die(f'Cannot find device "{dev}"')
+
+
 def ensure_root():
     if os.geteuid() != 0:
         die("must be run as root")
 
 
+# Once 8021q is loaded it stays loaded for the life of the process: probe once
+_8021Q_LOADED = False
+
+
 def ensure_8021q():
+    global _8021Q_LOADED
+    if _8021Q_LOADED:
+        return
     if not os.path.isdir("/sys/module/8021q"):
         run(["modprobe", "8021q"])
+    _8021Q_LOADED = True
 
 
 def parse_vlan_id(s):
-    try:
-        vid = int(s, 10)
-    except ValueError:
+    # ASCII digits only: int() would also take signs, '_', whitespace and
+    # non-ASCII digits; leading zeros are fine (decimal, never octal)
+    if not (s.isascii() and s.isdigit()):
         die(f"invalid vlan_id '{s}' (use decimal)")
+    vid = int(s)
     if not (1 <= vid <= 4094):
         die("vlan_id must be in range 1..4094")
     return vid
@@ -206,6 +468,10 @@ def _extract_name_opt(args):
     return name, rest
 
 
+def _vlan_newlink_attrs(parent_index, vid):
+    return _nla(IFLA_LINK, _U32.pack(parent_index)) + _vlan_linkinfo(_nla(IFLA_VLAN_ID, _U16.pack(vid)))
+
+
 def cmd_add(args):
     # add [interface-name] [vlan_id] [-name IFNAME]
     name_opt, core = _extract_name_opt(args)
@@ -214,37 +480,120 @@ def cmd_add(args):
 
     parent, vid_s = core
     vid = parse_vlan_id(vid_s)
+    parent_index = _ifindex(parent)
     ensure_8021q()
 
     # If -name supplied, validate first, else default to parent.VID
     if name_opt is not None:
         if not _valid_ifname(name_opt):
-            print(f"Provided -name '{name_opt}' is invalid (must be ≤{MAX_IFNAME_LEN} chars, no whitespace or '/').")
+            print(f"Provided -name '{name_opt}' is invalid (must be ≤{MAX_IFNAME_LEN} chars, no whitespace, '/' or ':').")
             # Prompt for a better one, suggesting vlan<VID>
             name = _prompt_for_ifname(f"vlan{vid}")
         else:
             name = name_opt
     else:
         name = f"{parent}.{vid}"
+        if not _valid_ifname(name):
+            name = _fallback_ifname(vid)
 
-    base_cmd = ["ip", "link", "add", "link", parent, "name", name, "type", "vlan", "id", str(vid)]
-    run_ip_with_ifname_retry(base_cmd, vid=vid)
+    nl_check(nl_request(RTM_NEWLINK, NLM_F_CREATE | NLM_F_EXCL,
+                        attrs=_vlan_newlink_attrs(parent_index, vid) + _nla_ifname(name)))
     # vconfig prints nothing on success
     return 0
 
 
+def cmd_add_range(args):
+    # add_range [interface-name] [first_vid] [last_vid]
+    if len(args) != 3:
+        die("usage: add_range [interface-name] [first_vid] [last_vid]")
+
+    parent, first_s, last_s = args
+    vids = _parse_vid_range(first_s, last_s)
+    parent_index = _ifindex(parent)
+    ensure_8021q()
+
+    batch = NlBatch()
+    for vid in vids:
+        name = _range_ifname(parent, vid)
+        batch.add(RTM_NEWLINK, NLM_F_CREATE | NLM_F_EXCL,
+                  attrs=_vlan_newlink_attrs(parent_index, vid) + _nla_ifname(name), tag=name)
+    batch.flush()
+    return _report_batch_errors(batch)
+
+
+def _report_batch_errors(batch):
+    for name, err in batch.errors:
+        print(f"vconfig: {name}: RTNETLINK answers: {os.strerror(err)}", file=sys.stderr)
+    if batch.errors:
+        sys.exit(1)
+    return 0
+
+
+def _parse_vid_range(first_s, last_s):
+    first, last = parse_vlan_id(first_s), parse_vlan_id(last_s)
+    if first > last:
+        die("first_vid must not be greater than last_vid")
+    return range(first, last + 1)
+
+
+def _range_ifname(parent, vid):
+    # No prompting mid-burst: fall back to vlan<VID> like a non-tty add
+    name = f"{parent}.{vid}"
+    return name if _valid_ifname(name) else f"vlan{vid}"
+
+
 def cmd_rem(args):
     if len(args) != 1:
         die("usage: rem [vlan-name]")
     dev = args[0]
-    run(["ip", "link", "delete", dev])
+    nl_check(nl_request(RTM_DELLINK, ifindex=_ifindex(dev)))
     return 0
 
 
+def cmd_rem_range(args):
+    # rem_range [interface-name] [first_vid] [last_vid]  (names as add_range)
+    if len(args) != 3:
+        die("usage: rem_range [interface-name] [first_vid] [last_vid]")
+
+    parent, first_s, last_s = args
+    vids = _parse_vid_range(first_s, last_s)
+
+    # Delete by IFLA_IFNAME so the kernel resolves each name; a missing VLAN
+    # comes back as ENODEV in its ACK instead of costing a lookup here.
+    batch = NlBatch()
+    for vid in vids:
+        name = _range_ifname(parent, vid)
+        batch.add(RTM_DELLINK, attrs=_nla_ifname(name), tag=name)
+    batch.flush()
+    return _report_batch_errors(batch)
+
+
+def _vlan_changelink(dev, *data):
+    """RTM_NEWLINK on an existing VLAN: the kernel routes it to changelink()."""
+    nl_check(nl_request(RTM_NEWLINK, ifindex=_ifindex(dev), attrs=_vlan_linkinfo(*data)))
+
+
+_ON_OFF = {"0": False, "1": True}
+
+# vconfig flag-num -> VLAN_FLAG_* bit
+_FLAG_MAP = {
+    "1": VLAN_FLAG_REORDER_HDR,
+    "2": VLAN_FLAG_GVRP,
+    "3": VLAN_FLAG_MVRP,
+    "4": VLAN_FLAG_LOOSE_BINDING,
+}
+
+
 def _on_off(v):
-    if v not in ("0", "1"):
+    try:
+        return _ON_OFF[v]
+    except KeyError:
         die("flag value must be 0 or 1")
-    return "on" if v == "1" else "off"
+
+
+def _set_vlan_flag(dev, flag, on):
+    # struct ifla_vlan_flags { __u32 flags; __u32 mask; }
+    _vlan_changelink(dev, _nla(IFLA_VLAN_FLAGS, _U32_PAIR.pack(flag if on else 0, flag)))
 
 
 def cmd_set_flag(args):
@@ -252,47 +601,99 @@ def cmd_set_flag(args):
     # set_flag <dev> <flagnum> <0|1>
     if len(args) == 2:
         dev, val = args
-        run(["ip", "link", "set", "dev", dev, "type", "vlan", "reorder_hdr", _on_off(val)])
+        _set_vlan_flag(dev, VLAN_FLAG_REORDER_HDR, _on_off(val))
         return 0
     if len(args) == 3:
         dev, flagnum, val = args
-        mapping = {
-            "1": "reorder_hdr",
-            "2": "gvrp",
-            "3": "mvrp",
-            "4": "loose_binding",
-        }
-        flag = mapping.get(flagnum)
+        flag = _FLAG_MAP.get(flagnum)
         if not flag:
             die("flag-num must be one of 1(reorder_hdr), 2(gvrp), 3(mvrp), 4(loose_binding)")
-        run(["ip", "link", "set", "dev", dev, "type", "vlan", flag, _on_off(val)])
+        _set_vlan_flag(dev, flag, _on_off(val))
         return 0
     die("usage: set_flag [vlan-name] [flag-num] [0|1] (or) set_flag [vlan-name] [0|1]")
 
 
+def _is_uint(s):
+    return s.isascii() and s.isdigit()
+
+
+def _parse_qos_pair(skb, qos):
+    # Both fields are __u32 on the wire, so a sign is never valid
+    if not (_is_uint(skb) and _is_uint(qos)):
+        die("skb_priority and vlan_qos must be non-negative integers")
+    skb_i, qos_i = int(skb), int(qos)
+    if skb_i > 0xFFFFFFFF or qos_i > 0xFFFFFFFF:
+        die("skb_priority and vlan_qos must fit in 32 bits")
+    return skb_i, qos_i
+
+
+def _qos_mapping(attr, frm, to):
+    # attr { IFLA_VLAN_QOS_MAPPING { __u32 from; __u32 to; } }
+    return _nla(attr, _nla(IFLA_VLAN_QOS_MAPPING, _U32_PAIR.pack(frm, to)))
+
+
 def cmd_set_egress_map(args):
     # set_egress_map <dev> <skb> <qos>
     if len(args) != 3:
         die("usage: set_egress_map [vlan-name] [skb_priority] [vlan_qos]")
     dev, skb, qos = args
-    try:
-        int(skb); int(qos)
-    except ValueError:
-        die("skb_priority and vlan_qos must be integers")
-    run(["ip", "link", "set", "dev", dev, "type", "vlan", "egress-qos-map", f"{skb}:{qos}"])
+    skb_i, qos_i = _parse_qos_pair(skb, qos)
+    _vlan_changelink(dev, _qos_mapping(IFLA_VLAN_EGRESS_QOS, skb_i, qos_i))
     return 0
 
 
 def cmd_set_ingress_map(args):
-    # set_ingress_map <dev> <skb> <qos>  (ip expects qos:skb)
+    # set_ingress_map <dev> <skb> <qos>  (kernel mapping is qos -> skb)
     if len(args) != 3:
         die("usage: set_ingress_map [vlan-name] [skb_priority] [vlan_qos]")
     dev, skb, qos = args
+    skb_i, qos_i = _parse_qos_pair(skb, qos)
+    _vlan_changelink(dev, _qos_mapping(IFLA_VLAN_INGRESS_QOS, qos_i, skb_i))
+    return 0
+
+
+def cmd_batch(args):
+    # batch [file|-]  — one vconfig command per line, all in this process
+    if len(args) != 1:
+        die("usage: batch [file|-]")
+    path = args[0]
     try:
-        int(skb); int(qos)
-    except ValueError:
-        die("skb_priority and vlan_qos must be integers")
-    run(["ip", "link", "set", "dev", dev, "type", "vlan", "ingress-qos-map", f"{qos}:{skb}"])
+        if path == "-":
+            # Read everything first so an ifname prompt can't eat the next line
+            raw_lines = sys.stdin.buffer.readlines()
+        else:
+            with open(path, "rb") as f:
+                raw_lines = f.readlines()
+        # Decode like argv (surrogateescape), so non-UTF-8 ifnames work here too
+        lines = [os.fsdecode(line) for line in raw_lines]
+    except OSError as e:
+        die(f"cannot read '{path}': {e.strerror}")
+    except UnicodeDecodeError as e:
+        die(f"cannot read '{path}': {e}")
+
+    for lineno, line in enumerate(lines, 1):
+        try:
+            argv = shlex.split(line, comments=True)
+        except ValueError as e:
+            die(f"{path}:{lineno}: {e}")
+        if not argv:
+            continue
+        # argv can never hold a NUL, so neither may a batch line
+        if any("\0" in arg for arg in argv):
+            die(f"{path}:{lineno}: embedded NUL byte")
+        cmd, *cmd_args = argv
+        func = DISPATCH.get(cmd)
+        if func is cmd_batch:
+            die(f"{path}:{lineno}: 'batch' cannot be nested")
+        if not func:
+            die(f"{path}:{lineno}: unknown command '{cmd}'")
+        # Like 'ip -batch', stop at the first failing command
+        try:
+            func(cmd_args)
+        except SystemExit as e:
+            if e.code:
+                print(f"vconfig: command failed {path}:{lineno}", file=sys.stderr)
+            raise
     return 0
 
 
@@ -301,20 +702,25 @@ def usage():
     sys.exit(2)
 
 
+DISPATCH = {
+    "add": cmd_add,
+    "add_range": cmd_add_range,
+    "rem": cmd_rem,
+    "rem_range": cmd_rem_range,
+    "set_flag": cmd_set_flag,
+    "set_egress_map": cmd_set_egress_map,
+    "set_ingress_map": cmd_set_ingress_map,
+    "batch": cmd_batch,
+    # set_name_type removed; use -name on 'add' instead
+}
+
+
 def main():
     ensure_root()
     if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
         usage()
     cmd, *args = sys.argv[1:]
-    dispatch = {
-        "add": cmd_add,
-        "rem": cmd_rem,
-        "set_flag": cmd_set_flag,
-        "set_egress_map": cmd_set_egress_map,
-        "set_ingress_map": cmd_set_ingress_map,
-        # set_name_type removed; use -name on 'add' instead
-    }
-    func = dispatch.get(cmd)
+    func = DISPATCH.get(cmd)
     if not func:
         usage()
     func(args)